@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import os
-from utils import check_athlete_df, add_tier_to_df
+from utils import check_athlete_df, add_tier_to_df, file_lock, write_csv_atomic
+from derived_cache import load_tiered_athlete_data, cache_stats, clear_cache
 
 # Set page configuration
 st.set_page_config(
@@ -24,16 +25,17 @@ st.markdown("Welcome to Athlete Insights! Use the sidebar to navigate to differe
 ATHLETE_CSV_PATH = "./data/notignore/athlete_data.csv"
 # Initialize athlete_df in session state if it doesn't exist
 if 'athlete_df' not in st.session_state:
+    # Number of CSV rows this session knows about; the ingest server appends after them
+    st.session_state.athlete_csv_rows = 0
     # Try to load athlete data from CSV if it exists
     try:
         athlete_data_path = ATHLETE_CSV_PATH
         if os.path.exists(athlete_data_path):
-            st.session_state.athlete_df = pd.read_csv(athlete_data_path)
-            # Ensure Value column is treated as string for consistency with TextColumn
-            if not st.session_state.athlete_df.empty and 'Value' in st.session_state.athlete_df.columns:
-                st.session_state.athlete_df['Value'] = st.session_state.athlete_df['Value'].astype(str)
-            # Add tier information to the dataframe
-            st.session_state.athlete_df = add_tier_to_df(st.session_state.athlete_df)
+            # Load the tiered data from the disk cache when the CSV and thresholds are unchanged
+            # Lock so the row count is not taken in the middle of an ingest append
+            with file_lock(athlete_data_path):
+                st.session_state.athlete_df = load_tiered_athlete_data(athlete_data_path)
+            st.session_state.athlete_csv_rows = len(st.session_state.athlete_df)
         else:
             st.session_state.athlete_df = pd.DataFrame()
     except Exception as e:
@@ -241,10 +243,45 @@ with col2:
 with col3:
     if st.button("Save to local", help="Save the current athlete data to a CSV file"):
         try:
-            # Apply tier calculations before saving
-            df_to_save = add_tier_to_df(st.session_state.athlete_df)
-            # Save to CSV file
-            df_to_save.to_csv(ATHLETE_CSV_PATH, index=False)
-            st.success("Data saved to athlete_data.csv successfully!")
+            df_to_save = st.session_state.athlete_df
+            # Hold the lock from re-reading to rewriting so the ingest server
+            # cannot append rows in between that the rewrite would drop
+            with file_lock(ATHLETE_CSV_PATH):
+                # Keep rows the ingest server appended to the file since this session loaded it
+                ingested_df = pd.DataFrame()
+                try:
+                    ingested_df = pd.read_csv(ATHLETE_CSV_PATH).iloc[st.session_state.athlete_csv_rows:]
+                except (FileNotFoundError, pd.errors.EmptyDataError):
+                    pass
+                if not ingested_df.empty:
+                    ingested_df = ingested_df.drop(columns=["Tier Number"], errors="ignore")
+                    ingested_df['Value'] = ingested_df['Value'].astype(str)
+                    df_to_save = pd.concat([df_to_save, ingested_df], ignore_index=True)
+                # Apply tier calculations before saving
+                df_to_save = add_tier_to_df(df_to_save)
+                # Save to CSV file
+                write_csv_atomic(df_to_save, ATHLETE_CSV_PATH)
+            st.session_state.athlete_df = df_to_save
+            st.session_state.athlete_csv_rows = len(df_to_save)
+            st.session_state.editor_key += 1
+            if not ingested_df.empty:
+                st.success(f"Data saved to athlete_data.csv successfully! {len(ingested_df)} ingested rows were merged in.")
+            else:
+                st.success("Data saved to athlete_data.csv successfully!")
         except Exception as e:
             st.error(f"Error saving data: {e}")
+
+with st.expander("Derived Data Cache"):
+    stats = cache_stats()
+    stat_cols = st.columns(4)
+    stat_cols[0].metric("Hits", stats["hits"])
+    stat_cols[1].metric("Misses", stats["misses"])
+    stat_cols[2].metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+    stat_cols[3].metric("Entries", stats["entries"])
+    st.caption(
+        f"Cache size: {stats['size_bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.0f} MB | "
+        f"Writes: {stats['writes']} | Evictions: {stats['evictions']} | Errors: {stats['errors']}"
+    )
+    if st.button("Clear Cache", help="Remove all cached tiers, charts and best records"):
+        clear_cache()
+        st.success("Cache cleared!")
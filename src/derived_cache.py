@@ -0,0 +1,180 @@
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+from utils import (
+    THRESHOLD_CSV_PATH,
+    THRESHOLD_OVERRIDES_CSV_PATH,
+    add_tier_to_df,
+    build_best_codes,
+    build_code_pivots,
+)
+
+# Derived tables are pickled here; the directory is not tracked by git
+CACHE_DIR = "./data/cache"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+# Bump when the way derived tables are computed changes, to ignore old entries
+CACHE_VERSION = "2"
+CACHE_EXTENSION = ".pkl"
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+
+def _count(stat: str, amount: int = 1):
+    with _stats_lock:
+        _stats[stat] += amount
+
+
+def file_hash(path: str) -> str:
+    """Content hash of a file, or "missing" if it does not exist."""
+    if not os.path.exists(path):
+        return "missing"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataframe_hash(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (values, index, column names and dtypes)."""
+    digest = hashlib.sha256()
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode("utf-8"))
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def thresholds_hash() -> str:
+    """Combined content hash of threshold.csv and threshold_overrides.csv."""
+    return file_hash(THRESHOLD_CSV_PATH) + file_hash(THRESHOLD_OVERRIDES_CSV_PATH)
+
+
+def _entry_path(kind: str, *hashes: str) -> str:
+    key = hashlib.sha256("|".join((CACHE_VERSION, kind) + hashes).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{kind}-{key}{CACHE_EXTENSION}")
+
+
+def _load(path: str):
+    try:
+        value = pd.read_pickle(path)
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    except Exception as e:
+        # A corrupt or unreadable entry is treated as a miss and recomputed
+        print(f"Error reading cache entry {path}: {e}")
+        _count("errors")
+        _count("misses")
+        return None
+    # Touch the entry so eviction keeps recently used tables
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    _count("hits")
+    return value
+
+
+def _store(path: str, value):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pd.to_pickle(value, tmp_path)
+        os.replace(tmp_path, path)
+        _count("writes")
+        evict_cache()
+    except Exception as e:
+        print(f"Error writing cache entry {path}: {e}")
+        _count("errors")
+
+
+def _cached(kind: str, hashes: tuple, compute):
+    path = _entry_path(kind, *hashes)
+    value = _load(path)
+    if value is None:
+        value = compute()
+        _store(path, value)
+    return value
+
+
+def _cache_entries() -> list:
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(CACHE_EXTENSION):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue  # Removed by another session in the meantime
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def evict_cache(max_bytes: int = MAX_CACHE_BYTES):
+    """Removes least recently used entries until the cache fits in max_bytes."""
+    entries = sorted(_cache_entries())
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            _count("evictions")
+        except OSError:
+            pass
+        total_bytes -= size
+
+
+def clear_cache():
+    """Removes every cache entry."""
+    for _, _, path in _cache_entries():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters for this process and the current size of the cache."""
+    entries = _cache_entries()
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    stats["entries"] = len(entries)
+    stats["size_bytes"] = sum(size for _, size, _ in entries)
+    stats["max_bytes"] = MAX_CACHE_BYTES
+    return stats
+
+
+def load_tiered_athlete_data(csv_path: str) -> pd.DataFrame:
+    """
+    Loads the athlete CSV with tier information, reusing the cached table
+    when neither the CSV nor the thresholds have changed.
+    """
+    def compute():
+        df = pd.read_csv(csv_path)
+        # Ensure Value column is treated as string for consistency with TextColumn
+        if not df.empty and 'Value' in df.columns:
+            df['Value'] = df['Value'].astype(str)
+        return add_tier_to_df(df)
+
+    return _cached("tiered", (file_hash(csv_path), thresholds_hash()), compute)
+
+
+def get_code_pivots(df: pd.DataFrame) -> dict:
+    """Cached version of utils.build_code_pivots (keyed on the data only, pivots do not use tiers)."""
+    return _cached("pivots", (dataframe_hash(df),), lambda: build_code_pivots(df))
+
+
+def get_best_codes(df: pd.DataFrame) -> pd.DataFrame:
+    """Cached version of utils.build_best_codes (keyed on the data only, it reads the stored Tier Number)."""
+    return _cached("best_codes", (dataframe_hash(df),), lambda: build_best_codes(df))
@@ -0,0 +1,433 @@
+import argparse
+import io
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from utils import check_athlete_df, add_tier_to_df, file_lock
+
+# Paths match the ones used by the Streamlit pages (run from the project root)
+ATHLETE_CSV_PATH = "./data/notignore/athlete_data.csv"
+THRESHOLD_CSV_PATH = "./data/notignore/threshold.csv"
+SPORTS_CSV_PATH = "./data/notignore/sports.csv"
+
+REQUIRED_COLS = ["Athlete Name", "Test Date", "Sport", "Test Name", "Test Code", "Value"]
+
+# Backpressure / micro-batching settings
+MAX_QUEUE_BATCHES = 64       # batches waiting to be written before we answer 503
+MAX_FLUSH_ROWS = 5000        # rows written to the CSV in one go
+FLUSH_INTERVAL_SECONDS = 0.5 # how long the writer waits to group batches together
+MAX_BODY_BYTES = 10 * 1024 * 1024
+RATE_WINDOW_SECONDS = 60
+
+
+def load_reference_data() -> tuple[pd.DataFrame, list]:
+    """
+    Loads the valid test codes and sports the same way app.py does.
+
+    Returns:
+        Tuple of (test_name_code_df, sports_list)
+    """
+    try:
+        threshold_df = pd.read_csv(THRESHOLD_CSV_PATH)
+        test_name_code_df = threshold_df.drop_duplicates(subset=["Code"])
+        test_name_code_df = test_name_code_df.rename(columns={"Code": "Test Code"})
+    except Exception as e:
+        print(f"Error loading threshold data: {e}")
+        test_name_code_df = pd.DataFrame()
+
+    try:
+        sports_list = pd.read_csv(SPORTS_CSV_PATH)["Name"].tolist()
+    except Exception as e:
+        print(f"Error loading sports data: {e}")
+        sports_list = []
+
+    return test_name_code_df, sports_list
+
+
+def parse_batch(body: bytes, content_type: str) -> pd.DataFrame:
+    """
+    Parses a request body into a DataFrame of athlete results.
+
+    JSON bodies may be a list of records or an object with a "records" list.
+    Anything sent as text/csv is read with pandas.
+
+    Raises:
+        ValueError: if the body cannot be parsed.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        try:
+            df = pd.read_csv(io.BytesIO(body))
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame()
+        except Exception as e:
+            raise ValueError(f"Invalid CSV: {e}")
+    else:
+        try:
+            payload = json.loads(body.decode("utf-8") or "[]")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get("records", [])
+        if not isinstance(payload, list) or not all(isinstance(r, dict) for r in payload):
+            raise ValueError("JSON body must be a list of records or {\"records\": [...]}")
+        df = pd.DataFrame(payload)
+
+    # Ensure Value column is treated as string for consistency with the app
+    if "Value" in df.columns:
+        df["Value"] = df["Value"].astype(str)
+    return df
+
+
+def split_valid_rows(df: pd.DataFrame, test_name_code_df: pd.DataFrame,
+                     sports_list: list) -> tuple[pd.DataFrame, int, list[str]]:
+    """
+    Applies the check_athlete_df rules to a batch and keeps only the rows that pass.
+
+    Returns:
+        Tuple of (accepted_df, rejected_count, error_messages)
+    """
+    if df.empty:
+        return df, 0, []
+
+    all_checks_passed, error_messages = check_athlete_df(df, test_name_code_df, sports_list)
+    if all_checks_passed:
+        return df, 0, []
+
+    # Missing required columns means nothing in the batch can be stored
+    if any(col not in df.columns for col in REQUIRED_COLS):
+        return df.iloc[0:0], len(df), error_messages
+
+    # Same row rules as check_athlete_df, applied as a mask
+    valid_mask = df["Sport"].isin(sports_list)
+    if not test_name_code_df.empty:
+        valid_mask &= df["Test Code"].isin(test_name_code_df["Test Code"])
+
+    return df[valid_mask], int((~valid_mask).sum()), error_messages
+
+
+class IngestStats:
+    """Thread-safe counters for the /metrics endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.batches_received = 0
+        self.batches_throttled = 0
+        self.batches_failed = 0
+        self.rows_accepted = 0
+        self.rows_rejected = 0
+        self.rows_written = 0
+        self.flushes = 0
+        self.write_errors = 0
+        self.rows_failed = 0
+        self._recent_rows = deque()  # (timestamp, rows accepted)
+
+    def record_batch(self, accepted: int, rejected: int):
+        now = time.time()
+        with self._lock:
+            self.batches_received += 1
+            self.rows_accepted += accepted
+            self.rows_rejected += rejected
+            self._recent_rows.append((now, accepted))
+            self._trim(now)
+
+    def record_throttled(self):
+        with self._lock:
+            self.batches_throttled += 1
+
+    def record_failed(self):
+        with self._lock:
+            self.batches_failed += 1
+
+    def record_flush(self, rows: int):
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += rows
+
+    def record_write_error(self, rows: int):
+        with self._lock:
+            self.write_errors += 1
+            self.rows_failed += rows
+
+    def _trim(self, now: float):
+        while self._recent_rows and now - self._recent_rows[0][0] > RATE_WINDOW_SECONDS:
+            self._recent_rows.popleft()
+
+    def snapshot(self, queue_depth: int) -> dict:
+        now = time.time()
+        with self._lock:
+            self._trim(now)
+            uptime = max(now - self.started_at, 1e-9)
+            window = min(uptime, RATE_WINDOW_SECONDS)
+            recent_rows = sum(rows for _, rows in self._recent_rows)
+            return {
+                "uptime_seconds": round(uptime, 3),
+                "batches_received": self.batches_received,
+                "batches_throttled": self.batches_throttled,
+                "batches_failed": self.batches_failed,
+                "rows_accepted": self.rows_accepted,
+                "rows_rejected": self.rows_rejected,
+                "rows_written": self.rows_written,
+                "flushes": self.flushes,
+                "write_errors": self.write_errors,
+                "rows_failed": self.rows_failed,
+                "queue_depth": queue_depth,
+                "queue_capacity": MAX_QUEUE_BATCHES,
+                "rows_per_second": round(self.rows_accepted / uptime, 3),
+                "rows_per_second_recent": round(recent_rows / window, 3),
+            }
+
+
+class AthleteDataWriter(threading.Thread):
+    """
+    Single writer thread that drains the ingest queue and appends
+    grouped batches to the athlete CSV, so concurrent posts never
+    write to the file at the same time.
+    """
+
+    def __init__(self, batch_queue: queue.Queue, stats: IngestStats,
+                 csv_path: str = ATHLETE_CSV_PATH):
+        super().__init__(name="athlete-data-writer", daemon=True)
+        self.batch_queue = batch_queue
+        self.stats = stats
+        self.csv_path = csv_path
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set() or not self.batch_queue.empty():
+            try:
+                first = self.batch_queue.get(timeout=FLUSH_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+
+            pending = [first]
+            pending_rows = len(first)
+            deadline = time.time() + FLUSH_INTERVAL_SECONDS
+            # Keep grouping batches until the row cap or the flush interval is hit
+            while pending_rows < MAX_FLUSH_ROWS:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch = self.batch_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(batch)
+                pending_rows += len(batch)
+
+            self._flush(pending)
+            for _ in pending:
+                self.batch_queue.task_done()
+
+    def _flush(self, batches: list[pd.DataFrame]):
+        df = pd.concat(batches, ignore_index=True)
+        try:
+            # Shared with the app's "Save to local", which rewrites the same file
+            with file_lock(self.csv_path):
+                try:
+                    # Keep the column order of the existing file
+                    existing_cols = pd.read_csv(self.csv_path, nrows=0).columns.tolist()
+                except (FileNotFoundError, pd.errors.EmptyDataError):
+                    # Missing, or saved empty from the app (no header line)
+                    existing_cols = []
+                file_exists = bool(existing_cols)
+                if file_exists:
+                    extra_cols = [col for col in df.columns if col not in existing_cols]
+                    if extra_cols:
+                        print(f"Dropping unknown columns from ingest: {', '.join(extra_cols)}")
+                    df = df.reindex(columns=existing_cols)
+                df.to_csv(self.csv_path, mode="a", header=not file_exists, index=False)
+            self.stats.record_flush(len(df))
+        except Exception as e:
+            # The batches were already acknowledged with 202 (queued), so the
+            # only signal left is the rows_failed counter in /metrics
+            self.stats.record_write_error(len(df))
+            print(f"Error writing {len(df)} ingested rows to {self.csv_path}: {e}")
+
+
+class IngestServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Listen backlog; the default of 5 resets connections under concurrent posts
+    # before they reach the handler and get a 503
+    request_queue_size = 128
+
+    def __init__(self, server_address, csv_path: str = ATHLETE_CSV_PATH):
+        super().__init__(server_address, IngestRequestHandler)
+        # (file mtimes, (test_name_code_df, sports_list)), replaced as one tuple
+        self._reference_data = (None, None)
+        self._reference_data_lock = threading.Lock()
+        self.stats = IngestStats()
+        self.batch_queue = queue.Queue(maxsize=MAX_QUEUE_BATCHES)
+        self.writer = AthleteDataWriter(self.batch_queue, self.stats, csv_path)
+        self._batch_counter = 0
+        self._batch_counter_lock = threading.Lock()
+
+    def reference_data(self) -> tuple[pd.DataFrame, list]:
+        """
+        Valid test codes and sports, reloaded when threshold.csv or sports.csv
+        change so edits on the thresholds and sports pages apply without a restart.
+        """
+        mtimes = tuple(
+            os.path.getmtime(path) if os.path.exists(path) else None
+            for path in (THRESHOLD_CSV_PATH, SPORTS_CSV_PATH)
+        )
+        cached_mtimes, data = self._reference_data
+        if cached_mtimes == mtimes:
+            return data
+        with self._reference_data_lock:
+            cached_mtimes, data = self._reference_data
+            if cached_mtimes != mtimes:
+                data = load_reference_data()
+                self._reference_data = (mtimes, data)
+        return data
+
+    def next_batch_id(self) -> int:
+        with self._batch_counter_lock:
+            self._batch_counter += 1
+            return self._batch_counter
+
+    def serve_forever(self, poll_interval=0.5):
+        self.writer.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            # Flush whatever is still queued before exiting
+            self.writer.stop()
+            self.writer.join()
+
+
+class IngestRequestHandler(BaseHTTPRequestHandler):
+    server: IngestServer
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send_json(200, self.server.stats.snapshot(self.server.batch_queue.qsize()))
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/ingest":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        length = self._content_length()
+        if length is None:
+            return
+        if length > MAX_BODY_BYTES:
+            self.server.stats.record_failed()
+            self._discard_body(length)
+            self._send_json(413, {"error": f"Batch larger than {MAX_BODY_BYTES} bytes"})
+            return
+
+        # Refuse early when the writer is behind, before parsing anything.
+        # The body is still drained, otherwise closing the socket with unread
+        # data resets the connection and the client never sees the 503.
+        if self.server.batch_queue.full():
+            self._discard_body(length)
+            self._send_throttled()
+            return
+
+        body = self.rfile.read(length)
+        try:
+            df = parse_batch(body, self.headers.get("Content-Type"))
+        except ValueError as e:
+            self.server.stats.record_failed()
+            self._send_json(400, {"error": str(e)})
+            return
+
+        test_name_code_df, sports_list = self.server.reference_data()
+        accepted_df, rejected, error_messages = split_valid_rows(df, test_name_code_df, sports_list)
+
+        if not accepted_df.empty:
+            # Add tier information to the accepted rows
+            accepted_df = add_tier_to_df(accepted_df.copy())
+            try:
+                self.server.batch_queue.put_nowait(accepted_df)
+            except queue.Full:
+                self._send_throttled()
+                return
+
+        self.server.stats.record_batch(len(accepted_df), rejected)
+        self._send_json(202, {
+            "batch_id": self.server.next_batch_id(),
+            "received": len(df),
+            "accepted": len(accepted_df),
+            "rejected": rejected,
+            "errors": error_messages,
+        })
+
+    def _content_length(self) -> int | None:
+        # Without a usable length the body cannot be read or drained safely,
+        # so answer and close the connection instead
+        header = self.headers.get("Content-Length")
+        if header is None:
+            status, message = 411, "Content-Length header is required"
+        elif not header.strip().isdigit():
+            status, message = 400, f"Invalid Content-Length: {header}"
+        else:
+            return int(header)
+        self.server.stats.record_failed()
+        self.close_connection = True
+        self._send_json(status, {"error": message}, headers={"Connection": "close"})
+        return None
+
+    def _discard_body(self, length: int):
+        # Read and drop the body in chunks so large batches are not held in memory
+        remaining = length
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 64 * 1024))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+
+    def _send_throttled(self):
+        self.server.stats.record_throttled()
+        self._send_json(503, {"error": "Ingest queue is full, retry later"},
+                        headers={"Retry-After": "1"})
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet; /metrics has the numbers
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP ingest for athlete results")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    server = IngestServer((args.host, args.port))
+    print(f"Ingest server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from derived_cache import get_code_pivots, get_best_codes
 
 # The function definition is removed, Streamlit will run this file directly when navigated to.
 
@@ -59,22 +60,16 @@ if 'athlete_df' in st.session_state:
     # Show Best Records button
     if st.button("Show Best Records", type="secondary"):
         if st.session_state.applied_athlete_filter != "All Athletes" and st.session_state.applied_sport_filter != "All Sports":
-            # Filter data for the selected athlete and sport
-            best_records_df = current_df[
-                (current_df['Athlete Name'] == st.session_state.applied_athlete_filter) & 
-                (current_df['Sport'] == st.session_state.applied_sport_filter)
-            ]
+            # Best codes (like "A3-B2") for the whole roster, cached on disk
+            best_codes_df = get_best_codes(current_df)
+            # Rows without a Test Code are left out of the roster, so there may be no match
+            best_record_strings = best_codes_df[
+                (best_codes_df['Athlete Name'] == st.session_state.applied_athlete_filter) &
+                (best_codes_df['Sport'] == st.session_state.applied_sport_filter)
+            ]['Best Code']
             
-            if not best_records_df.empty and 'Test Code' in best_records_df.columns and 'Tier Number' in best_records_df.columns:
-                # Find the best (highest) tier number for each test code
-                best_records = best_records_df.groupby('Test Code')['Tier Number'].max().reset_index()
-                
-                # Create the formatted string like "A3-B2"
-                record_parts = []
-                for _, row in best_records.iterrows():
-                    record_parts.append(f"{row['Test Code']}{row['Tier Number']}")
-                
-                best_record_string = "-".join(record_parts)
+            if not best_record_strings.empty:
+                best_record_string = best_record_strings.iloc[0]
                 
                 st.success(f"**Best Records for {st.session_state.applied_athlete_filter} in {st.session_state.applied_sport_filter}:** {best_record_string}")
             else:
@@ -115,6 +110,8 @@ if 'athlete_df' in st.session_state:
         st.subheader("Progress Charts by Test Code")
         
         df_to_display = df_to_display.sort_values(by='Test Date')
+        # Per-code progress tables, cached on disk
+        code_pivots = get_code_pivots(df_to_display)
 
         for test_code in sorted(df_to_display['Test Code'].unique()):
             st.markdown(f"#### Progress for Test Code: {test_code}")
@@ -129,11 +126,8 @@ if 'athlete_df' in st.session_state:
                     is_numeric = not numeric_values.isna().all()
                     
                     if is_numeric:
-                        # For numeric data, convert to float and use line chart
-                        test_specific_df_numeric = test_specific_df.copy()
-                        test_specific_df_numeric['Value'] = pd.to_numeric(test_specific_df_numeric['Value'], errors='coerce')
-                        chart_data = test_specific_df_numeric.pivot_table(index='Test Date', columns='Athlete Name', values='Value')
-                        st.line_chart(chart_data)
+                        # For numeric data, use line chart
+                        st.line_chart(code_pivots[test_code])
                     else:
                         # For categorical/string data, use scatter plot with string values on y-axis
                         # Prepare data for plotly
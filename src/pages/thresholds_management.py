@@ -30,3 +30,56 @@ if st.button("Save Changes to Thresholds"):
         st.success("Thresholds saved successfully!")
     except Exception as e:
         st.error(f"Error saving thresholds: {e}")
+
+st.markdown("---")
+st.subheader("Sport and Level Overrides")
+st.markdown(
+    "Override the thresholds of a test for one sport, and optionally one level within that sport. "
+    "An override replaces all four tiers of the global rule above; leave Level empty to apply it to the whole sport. "
+    "Tests without an override use the global row."
+)
+
+OVERRIDES_CSV_PATH = "./data/notignore/threshold_overrides.csv"
+OVERRIDE_COLUMNS = ["Code", "Sport", "Level", "Tier 1", "Tier 2", "Tier 3", "Tier 4"]
+try:
+    overrides_df = pd.read_csv(OVERRIDES_CSV_PATH, dtype=str)
+except FileNotFoundError:
+    overrides_df = pd.DataFrame(columns=OVERRIDE_COLUMNS)
+except Exception as e:
+    st.error(f"Error loading threshold overrides: {e}")
+    overrides_df = pd.DataFrame(columns=OVERRIDE_COLUMNS)
+
+try:
+    sports_options = pd.read_csv("./data/notignore/sports.csv")["Name"].tolist()
+except Exception:
+    sports_options = []
+code_options = threshold_df["Code"].dropna().unique().tolist() if "Code" in threshold_df.columns else []
+
+edited_overrides_df = st.data_editor(
+    overrides_df.reindex(columns=OVERRIDE_COLUMNS),
+    use_container_width=True,
+    num_rows="dynamic",
+    key="threshold_overrides_editor",
+    column_config={
+        "Code": st.column_config.SelectboxColumn("Code", help="Test code to override", options=code_options, required=True),
+        "Sport": st.column_config.SelectboxColumn("Sport", help="Sport the override applies to", options=sports_options, required=True),
+        "Level": st.column_config.TextColumn("Level", help="Optional level within the sport (e.g. College, Pro)"),
+    },
+    hide_index=True
+)
+
+if st.button("Save Overrides"):
+    try:
+        missing_keys = edited_overrides_df["Code"].isna() | edited_overrides_df["Sport"].isna()
+        if missing_keys.any():
+            st.error("Error: every override needs a Code and a Sport.")
+        else:
+            edited_overrides_df["Level"] = edited_overrides_df["Level"].fillna("").str.strip()
+            duplicated = edited_overrides_df.duplicated(subset=["Code", "Sport", "Level"])
+            if duplicated.any():
+                st.warning("Duplicate overrides for the same Code, Sport and Level were removed (the first one is kept).")
+            edited_overrides_df = edited_overrides_df[~duplicated]
+            edited_overrides_df.to_csv(OVERRIDES_CSV_PATH, index=False)
+            st.success("Threshold overrides saved successfully! Use 'Refresh Tier Number' on the main page to re-tier existing data.")
+    except Exception as e:
+        st.error(f"Error saving threshold overrides: {e}")
@@ -1,12 +1,61 @@
-import pandas as pd
+import os
 import re
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
 from typing import Union, Tuple, List
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 
 # Define tier names as a constant list
 TIER_NAMES = ["Tier 1", "Tier 2", "Tier 3", "Tier 4"]
 TIER_MAP = {name: 3 - i for i, name in enumerate(TIER_NAMES)}
 
+@contextmanager
+def file_lock(path: str):
+    """
+    Holds an exclusive lock on "<path>.lock" so the app and the ingest server
+    never write the same CSV at the same time. Both sides must use it; tools
+    that edit the CSV directly are not covered.
+    """
+    with open(f"{path}.lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            # LK_LOCK only retries for ~10 seconds, so keep trying
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_csv_atomic(df: pd.DataFrame, path: str):
+    """Writes df to a temporary file and swaps it in, so readers never see a half-written CSV."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 # Helper function to parse condition string like "<=1.50"
 def _parse_condition(condition_str: str | None):
     if not condition_str: # Handles None or empty strings from CSV
@@ -86,82 +135,225 @@ def check_athlete_df(df: pd.DataFrame, test_name_code_df: pd.DataFrame,
     
     return all_checks_passed, error_messages
 
-def get_tier_for_test(test_code: str, value: Union[float, str]) -> str | None: # Modified signature
+THRESHOLD_CSV_PATH = "./data/notignore/threshold.csv"
+THRESHOLD_OVERRIDES_CSV_PATH = "./data/notignore/threshold_overrides.csv"
+OVERRIDE_KEY_COLS = ["Code", "Sport", "Level"]
+OVERRIDE_COLS = OVERRIDE_KEY_COLS + TIER_NAMES
+
+# Compiled lookup cache, rebuilt when either CSV changes on disk. Stored as one
+# (key, lookup) tuple so threads never see a new key with an old lookup.
+_threshold_lookup_cache = (None, None)
+
+
+def _clean_key(series: pd.Series) -> pd.Series:
+    # Blank / missing Sport or Level means "applies to all"
+    return series.fillna("").astype(str).str.strip()
+
+
+def compile_threshold_lookup(threshold_df: pd.DataFrame,
+                             overrides_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """
-    Determines the tier for a given test code and value based on thresholds in a CSV file,
-    using pandas for CSV processing.
+    Compiles the global thresholds and the sport/level overrides into one lookup table.
 
     Args:
-        test_code: The code for the test (e.g., 'A', 'S', 'FL').
-        value: The numerical value (for 'Tiered' scoring) or string value 
-               (for other scoring types like 'Movement Quality', 'Calculated') 
-               achieved by the athlete for the test.
+        threshold_df: Global rules, one row per Code (as in threshold.csv)
+        overrides_df: Override rows with Code, Sport, optional Level and the four tier columns.
+                      An override replaces all four tiers of the global rule.
 
     Returns:
-        A string representing the tier (from TIER_NAMES)
-        or None if the test code is not found, the scoring type is not applicable,
-        the value type is incorrect for the scoring type,
-        or the value does not match any defined tier.
+        DataFrame indexed by (Code, Sport, Level), where global rules have an empty
+        Sport and Level. Each row holds the Scoring Type, the parsed operator/value
+        of every tier (for 'Tiered' tests) and the lower-cased tier text (for the others).
     """
-    csv_file_path = "./data/notignore/threshold.csv"  # User's path
-    try:
-        df = pd.read_csv(csv_file_path) # Added comment='//'
+    global_rules = threshold_df[["Code", "Scoring Type"] + TIER_NAMES].copy()
+    global_rules["Sport"] = ""
+    global_rules["Level"] = ""
 
-        # Find the row matching the test_code
-        test_row = df[df['Code'] == test_code]
+    rules = [global_rules]
+    if overrides_df is not None and not overrides_df.empty:
+        overrides = overrides_df.reindex(columns=OVERRIDE_COLS).copy()
+        overrides["Code"] = _clean_key(overrides["Code"])
+        overrides["Sport"] = _clean_key(overrides["Sport"])
+        overrides["Level"] = _clean_key(overrides["Level"])
+        # Overrides need a sport, and inherit the scoring type of their global rule
+        overrides = overrides[overrides["Sport"] != ""]
+        scoring_types = threshold_df.drop_duplicates(subset=["Code"]).set_index("Code")["Scoring Type"]
+        overrides["Scoring Type"] = overrides["Code"].map(scoring_types)
+        rules.append(overrides[overrides["Scoring Type"].notna()])
 
-        if test_row.empty:
-            return None # Test code not found
+    lookup = pd.concat(rules, ignore_index=True)
+    lookup["Code"] = _clean_key(lookup["Code"])
+    # First row wins for duplicated keys, like the old per-code search
+    lookup = lookup.drop_duplicates(subset=OVERRIDE_KEY_COLS, keep="first")
 
-        # Get the first matching row (should be unique by Code)
-        row = test_row.iloc[0]
-        
-        scoring_type = row.get('Scoring Type')
-        
-        # Use TIER_NAMES constant to get tier condition strings from the row
-        tier_conditions_str = [row.get(tier_name) for tier_name in TIER_NAMES]
-        if scoring_type == 'Tiered':
-            if not str(value).replace('.', '').replace('-', '').isdigit():
-                return None # Value type mismatch for 'Tiered'
-
-            # Parse all conditions first (only relevant for 'Tiered')
-            parsed_conditions = [_parse_condition(str(cond_str)) if pd.notna(cond_str) else (None,None) for cond_str in tier_conditions_str]
-
-            # Convert value to float for comparison
-            float_value = float(value)
-            # Check all tiers in a loop
-            for i, (operator, threshold) in enumerate(parsed_conditions):
-                if _check_value(float_value, operator, threshold):
-                    return TIER_MAP[TIER_NAMES[i]]
-
-            return None # No 'Tiered' condition matched
-        
-        else: # For other scoring types like 'Movement Quality', 'Calculated'
-            if not isinstance(value, str):
-                return None # Value type mismatch for string-based scoring
-
-            processed_value = value.strip().lower()
-            # TIER_NAMES is now used directly from the module level
-
-            for i, csv_tier_content in enumerate(tier_conditions_str):
-                # Ensure content exists and is not just NaN converted to "nan"
-                if pd.notna(csv_tier_content) and str(csv_tier_content).strip() != "": 
-                    processed_csv_content = str(csv_tier_content).strip().lower()
-                    if processed_value == processed_csv_content:
-                        return TIER_MAP[TIER_NAMES[i]] # Use the constant list
-
-            return None # No string match found in any tier for this scoring type
-            
+    for tier_name in TIER_NAMES:
+        parsed = [_parse_condition(str(cond)) if pd.notna(cond) else (None, None) for cond in lookup[tier_name]]
+        lookup[f"{tier_name} Op"] = [op for op, _ in parsed]
+        lookup[f"{tier_name} Val"] = pd.to_numeric(pd.Series([val for _, val in parsed], index=lookup.index), errors="coerce")
+        lookup[f"{tier_name} Text"] = lookup[tier_name].where(lookup[tier_name].notna(), "").astype(str).str.strip().str.lower()
+
+    return lookup.set_index(OVERRIDE_KEY_COLS)
+
+
+def load_threshold_lookup(threshold_path: str = THRESHOLD_CSV_PATH,
+                          overrides_path: str = THRESHOLD_OVERRIDES_CSV_PATH) -> pd.DataFrame | None:
+    """
+    Loads and compiles threshold.csv and threshold_overrides.csv, reusing the
+    compiled lookup until one of the files changes.
+
+    Returns:
+        The compiled lookup (see compile_threshold_lookup) or None if the
+        threshold file cannot be read.
+    """
+    global _threshold_lookup_cache
+    try:
+        overrides_mtime = os.path.getmtime(overrides_path) if os.path.exists(overrides_path) else None
+        cache_key = (threshold_path, os.path.getmtime(threshold_path), overrides_path, overrides_mtime)
+        cached_key, cached_lookup = _threshold_lookup_cache
+        if cached_key == cache_key:
+            return cached_lookup
+
+        threshold_df = pd.read_csv(threshold_path)
+        overrides_df = pd.read_csv(overrides_path) if overrides_mtime is not None else None
+        lookup = compile_threshold_lookup(threshold_df, overrides_df)
     except FileNotFoundError:
-        print(f"Error: CSV file not found at {csv_file_path}")
+        print(f"Error: CSV file not found at {threshold_path}")
         return None
-    except pd.errors.EmptyDataError: # Specific pandas error for empty CSV
-        print(f"Error: CSV file at {csv_file_path} is empty or malformed after filtering comments.")
+    except pd.errors.EmptyDataError:
+        print(f"Error: CSV file at {threshold_path} is empty or malformed.")
         return None
     except Exception as e:
-        print(f"An error occurred while processing the CSV file with pandas: {e}")
+        print(f"An error occurred while processing the threshold CSV files with pandas: {e}")
         return None
 
+    _threshold_lookup_cache = (cache_key, lookup)
+    return lookup
+
+
+def resolve_threshold_rules(lookup: pd.DataFrame, codes: pd.Series, sports: pd.Series,
+                            levels: pd.Series) -> pd.DataFrame:
+    """
+    Resolves the most specific rule for every row: (code, sport, level), then
+    (code, sport), then the global rule for the code.
+
+    Returns:
+        DataFrame aligned with codes, with all-NaN rows where the code is unknown.
+    """
+    codes, sports, levels = _clean_key(codes), _clean_key(sports), _clean_key(levels)
+    blank = pd.Series("", index=codes.index)
+
+    positions = lookup.index.get_indexer(pd.MultiIndex.from_arrays([codes, blank, blank]))
+    for key_sports, key_levels in ((sports, blank), (sports, levels)):
+        specific = lookup.index.get_indexer(pd.MultiIndex.from_arrays([codes, key_sports, key_levels]))
+        positions = np.where(specific >= 0, specific, positions)
+
+    # Position -1 (unknown code) points at an extra all-NaN row
+    padded = pd.concat([lookup.reset_index(drop=True), pd.DataFrame(index=[len(lookup)])])
+    resolved = padded.iloc[np.where(positions >= 0, positions, len(lookup))]
+    resolved.index = codes.index
+    return resolved
+
+
+def get_tiers_for_values(codes: pd.Series, values: pd.Series, sports: pd.Series | None = None,
+                         levels: pd.Series | None = None) -> pd.Series:
+    """
+    Vectorized version of get_tier_for_test for whole columns.
+
+    Args:
+        codes: Test codes
+        values: Values achieved (numbers or strings, as in get_tier_for_test)
+        sports: Athlete sports, used to pick sport overrides (optional)
+        levels: Athlete levels, used to pick level overrides (optional)
+
+    Returns:
+        Series of tier numbers (nullable integers) aligned with codes
+    """
+    tiers = pd.Series(pd.NA, index=codes.index, dtype="Int64")
+    lookup = load_threshold_lookup()
+    if lookup is None or codes.empty:
+        return tiers
+
+    blank = pd.Series("", index=codes.index)
+    keys = pd.DataFrame({
+        "Code": codes,
+        "Sport": blank if sports is None else sports,
+        "Level": blank if levels is None else levels,
+    })
+    # Resolve each distinct (code, sport, level) once, then broadcast back to the rows
+    key_ids = keys.groupby(OVERRIDE_KEY_COLS, sort=False, dropna=False).ngroup().to_numpy()
+    unique_keys = keys.drop_duplicates()
+    rules = resolve_threshold_rules(lookup, unique_keys["Code"], unique_keys["Sport"], unique_keys["Level"])
+
+    def rule_column(column, dtype=object):
+        return rules[column].to_numpy(dtype=dtype)[key_ids]
+
+    # Parse each distinct value once as well
+    value_ids, unique_values = pd.factorize(values.astype(object), use_na_sentinel=False)
+    unique_values = pd.Series(unique_values, dtype=object)
+    str_values = unique_values.astype(str)
+
+    # 'Tiered' tests compare numbers against the parsed conditions
+    is_number = str_values.str.replace(".", "", regex=False).str.replace("-", "", regex=False).str.isdigit()
+    numbers = pd.to_numeric(str_values.where(is_number), errors="coerce").to_numpy(dtype=float)[value_ids]
+    scoring_types = rule_column("Scoring Type")
+    tiered = scoring_types == "Tiered"
+
+    # Other scoring types match the value text against the tier text
+    is_text = unique_values.map(lambda v: isinstance(v, str)).astype(bool)
+    texts = str_values.str.strip().str.lower().where(is_text).to_numpy(dtype=object)[value_ids]
+    has_text = pd.notna(texts)
+    text_scored = pd.notna(scoring_types) & ~tiered
+
+    tier_numbers = np.full(len(codes), -1)
+    for tier_name in TIER_NAMES:
+        ops = rule_column(f"{tier_name} Op")
+        thresholds = rule_column(f"{tier_name} Val", dtype=float)
+        with np.errstate(invalid="ignore"):
+            number_match = (
+                ((ops == "<=") & (numbers <= thresholds))
+                | ((ops == "<") & (numbers < thresholds))
+                | ((ops == ">=") & (numbers >= thresholds))
+                | ((ops == ">") & (numbers > thresholds))
+            )
+        tier_texts = rule_column(f"{tier_name} Text")
+        text_match = has_text & pd.notna(tier_texts) & (tier_texts != "") & (texts == tier_texts)
+
+        # The first matching tier wins
+        match = (tier_numbers == -1) & ((tiered & number_match) | (text_scored & text_match))
+        tier_numbers[match] = TIER_MAP[tier_name]
+
+    tiers[tier_numbers >= 0] = tier_numbers[tier_numbers >= 0]
+    return tiers
+
+
+def get_tier_for_test(test_code: str, value: Union[float, str], sport: str | None = None,
+                      level: str | None = None) -> int | None:
+    """
+    Determines the tier for a given test code and value based on thresholds in a CSV file,
+    using the sport/level overrides when they exist.
+
+    Args:
+        test_code: The code for the test (e.g., 'A', 'S', 'FL').
+        value: The numerical value (for 'Tiered' scoring) or string value 
+               (for other scoring types like 'Movement Quality', 'Calculated') 
+               achieved by the athlete for the test.
+        sport: The athlete's sport, to use a sport override if one is defined.
+        level: The athlete's level, to use a sport + level override if one is defined.
+
+    Returns:
+        The tier number (from TIER_MAP)
+        or None if the test code is not found, the scoring type is not applicable,
+        the value type is incorrect for the scoring type,
+        or the value does not match any defined tier.
+    """
+    tier = get_tiers_for_values(
+        pd.Series([test_code]),
+        pd.Series([value], dtype=object),
+        pd.Series([sport], dtype=object),
+        pd.Series([level], dtype=object),
+    ).iloc[0]
+    return None if pd.isna(tier) else int(tier)
+
 
 # Function to add tier information to athlete dataframe
 def add_tier_to_df(df):
@@ -169,12 +361,55 @@ def add_tier_to_df(df):
         return df
     if "Tier Number" in df.columns:
         df.drop(columns=["Tier Number"], inplace=True)
-    # Create a new 'Tier Number' column and apply get_tier_for_test using pandas apply
-    df.insert(df.columns.get_loc('Test Code') + 1, 'Tier Number', 
-              df.apply(lambda row: get_tier_for_test(row['Test Code'], row['Value']), axis=1))
+    # Create a new 'Tier Number' column from the compiled threshold lookup,
+    # using the athlete's Sport (and Level, if the data has one) for overrides
+    df.insert(df.columns.get_loc('Test Code') + 1, 'Tier Number',
+              get_tiers_for_values(df['Test Code'], df['Value'],
+                                   df['Sport'] if 'Sport' in df.columns else None,
+                                   df['Level'] if 'Level' in df.columns else None))
     
     return df
 
+def build_code_pivots(df: pd.DataFrame) -> dict:
+    """
+    Builds the per-code progress tables used by the dashboard line charts.
+
+    Args:
+        df: Athlete data with 'Test Date' already converted to datetime
+
+    Returns:
+        Dict of Test Code -> pivot table (Test Date x Athlete Name) for codes with numeric values.
+        Codes with only text values are left out and charted from the raw rows instead.
+    """
+    pivots = {}
+    if df.empty or not {'Test Code', 'Value', 'Test Date', 'Athlete Name'}.issubset(df.columns):
+        return pivots
+
+    numeric_df = df.assign(Value=pd.to_numeric(df['Value'], errors='coerce'))
+    for test_code, test_specific_df in numeric_df.groupby('Test Code', sort=True):
+        if test_specific_df['Value'].isna().all():
+            continue
+        pivots[test_code] = test_specific_df.pivot_table(index='Test Date', columns='Athlete Name', values='Value')
+    return pivots
+
+
+def build_best_codes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds the best record string (e.g. "A3-FL2") for every athlete and sport,
+    from the highest tier reached on each test code.
+
+    Returns:
+        DataFrame with 'Athlete Name', 'Sport' and 'Best Code' columns
+    """
+    columns = ['Athlete Name', 'Sport', 'Best Code']
+    if df.empty or not {'Athlete Name', 'Sport', 'Test Code', 'Tier Number'}.issubset(df.columns):
+        return pd.DataFrame(columns=columns)
+
+    best = df.groupby(['Athlete Name', 'Sport', 'Test Code'])['Tier Number'].max().reset_index()
+    # Codes that never matched a tier are marked with '?' (e.g. "DSI?")
+    best['Code'] = best['Test Code'].astype(str) + best['Tier Number'].astype('string').fillna('?')
+    return best.groupby(['Athlete Name', 'Sport'])['Code'].agg('-'.join).reset_index(name='Best Code')[columns]
+
 # Example usage (optional, for testing within this file if run directly):
 if __name__ == '__main__':
     # Make sure threshold.csv is in the specified path for these examples to work